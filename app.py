@@ -1,9 +1,16 @@
 import os
+import re
+import sys
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timezone, timedelta, date
-from flask import Flask, jsonify, request, send_from_directory
+from zipfile import ZipFile, ZIP_DEFLATED
+from flask import Flask, request, send_from_directory
 from flask_cors import CORS
-from openpyxl import load_workbook
 
 app = Flask(__name__)
 CORS(app)
@@ -19,6 +26,22 @@ BUBBLE_DATA_API_TOKEN = os.environ.get("BUBBLE_DATA_API_TOKEN", "")
 BUBBLE_APP_TYPE = os.environ.get("BUBBLE_APP_TYPE", "00. Application")
 TEMPLATE_PATH = os.environ.get("TEMPLATE_PATH", "IBGC_Application_Template.xlsx")
 
+# concurrent Bubble lookups when resolving related things
+BUBBLE_FETCH_WORKERS = int(os.environ.get("BUBBLE_FETCH_WORKERS", "8"))
+
+# let a front proxy (nginx/Apache) stream /download files via X-Sendfile
+USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE", "") == "1"
+
+# nginx: internal location mapped to generated/ (e.g. "/_generated/");
+# when set, /download hands the transfer to nginx via X-Accel-Redirect
+X_ACCEL_REDIRECT_PREFIX = os.environ.get("X_ACCEL_REDIRECT_PREFIX", "")
+
+# request bodies are tiny ("{}" from the scheduler); refuse anything large
+MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", str(1024 * 1024)))
+
+# zlib level for the saved xlsx (1=fastest, 9=smallest; 6 = openpyxl default)
+XLSX_COMPRESSLEVEL = int(os.environ.get("XLSX_COMPRESSLEVEL", "6"))
+
 # Bubble Data API base
 BUBBLE_DATA_API_BASE = f"{BUBBLE_BASE_URL}/api/1.1/obj"
 
@@ -27,6 +50,21 @@ BUBBLE_FILEUPLOAD_URL = os.environ.get("BUBBLE_FILEUPLOAD_URL", f"{BUBBLE_BASE_U
 
 KST = timezone(timedelta(hours=9))
 
+GENERATED_DIR = "generated"
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+app.config["USE_X_SENDFILE"] = USE_X_SENDFILE
+app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
+
+# one line per worker at import so Render's logs show which config is live
+print(
+    f"[ibgc_exel] template={TEMPLATE_PATH} app_type={BUBBLE_APP_TYPE} "
+    f"fetch_workers={BUBBLE_FETCH_WORKERS} compresslevel={XLSX_COMPRESSLEVEL} "
+    f"x_sendfile={USE_X_SENDFILE} x_accel_prefix={X_ACCEL_REDIRECT_PREFIX or '-'}",
+    flush=True,
+)
+
 # =========================
 # SHEET NAMES (4 sheets)
 # =========================
@@ -44,6 +82,17 @@ TYPE_DECISION_STAGE2 = "09. Decision Report : Stage2"
 TYPE_CERT_ISSUANCE = "11. Certificate issuance"
 TYPE_CHAPTER_VIEWER = "Chapter Viewer"  # ✅ 추가
 
+# (field on application, related type) resolved for every row
+RELATED_FIELDS = (
+    ("01. Application Form", TYPE_APP_FORM),
+    ("03. Calcu_DB", TYPE_CALCU_DB),
+    ("06. Audit Program", TYPE_AUDIT_PROGRAM),
+    ("08. Decision Report : Stage1", TYPE_DECISION_STAGE1),
+    ("09. Decision Report : Stage2", TYPE_DECISION_STAGE2),
+    ("11. Certificate issuance", TYPE_CERT_ISSUANCE),
+    ("Chapter Viewer", TYPE_CHAPTER_VIEWER),
+)
+
 
 # =========================
 # UTIL
@@ -64,11 +113,34 @@ def today_label():
     return now_kst().strftime("IBGC_Application_%Y%m%d_%H%M%S.xlsx")
 
 
+# names produced by today_label(); anything else is never served
+_GENERATED_NAME_RE = re.compile(r"IBGC_Application_\d{8}_\d{6}\.xlsx")
+
+
+def is_generated_filename(name):
+    return _GENERATED_NAME_RE.fullmatch(name) is not None
+
+
+# token is fixed for the process: build the headers once, not per request
+_BUBBLE_HEADERS = {
+    "Authorization": f"Bearer {BUBBLE_DATA_API_TOKEN}",
+    "Content-Type": "application/json",
+}
+
+
 def bubble_headers():
-    return {
-        "Authorization": f"Bearer {BUBBLE_DATA_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
+    return _BUBBLE_HEADERS
+
+
+def json_response(obj):
+    # orjson instead of jsonify's stdlib json; pre-serialized bytes pass through
+    body = obj if isinstance(obj, bytes) else orjson.dumps(obj)
+    return app.response_class(body, mimetype="application/json")
+
+
+def bubble_json(res):
+    # parse Bubble response bytes directly (faster than res.json())
+    return orjson.loads(res.content)
 
 
 def ok_status(code: int) -> bool:
@@ -83,6 +155,11 @@ def safe_str(v, default=""):
     return s if s != "" else default
 
 
+# Python 3.11+ fromisoformat() parses a trailing "Z" itself; check once
+# instead of rewriting every timestamp string
+_FROMISOFORMAT_ACCEPTS_Z = sys.version_info >= (3, 11)
+
+
 def parse_bubble_date(value):
     """
     Bubble can return:
@@ -99,20 +176,24 @@ def parse_bubble_date(value):
         return value
     if not isinstance(value, str):
         return None
+    return _parse_bubble_date_str(value)
+
 
+@lru_cache(maxsize=1024)
+def _parse_bubble_date_str(value):
+    # same timestamps recur across columns/rows (and runs); results are immutable
     s = value.strip()
     if s == "":
         return None
 
-    # normalize Z
     try:
-        if s.endswith("Z"):
-            # fromisoformat doesn't accept Z, convert to +00:00
-            s2 = s[:-1] + "+00:00"
-            return datetime.fromisoformat(s2)
         # date-only
         if len(s) == 10 and s[4] == "-" and s[7] == "-":
             return datetime.fromisoformat(s).date()
+        # normalize Z
+        if not _FROMISOFORMAT_ACCEPTS_Z and s.endswith("Z"):
+            # fromisoformat doesn't accept Z before 3.11, convert to +00:00
+            s = s[:-1] + "+00:00"
         return datetime.fromisoformat(s)
     except Exception:
         return None
@@ -122,13 +203,18 @@ def fmt_yyyy_mm_dd(value, fallback="미해당"):
     d = parse_bubble_date(value)
     if d is None:
         return fallback
+    # date.isoformat() is "%Y-%m-%d" without going through strftime
     if isinstance(d, datetime):
-        return d.astimezone(KST).date().strftime("%Y-%m-%d")
+        return d.astimezone(KST).date().isoformat()
     if isinstance(d, date):
-        return d.strftime("%Y-%m-%d")
+        return d.isoformat()
     return fallback
 
 
+# unpadded day flag differs by platform; decide once, not per value
+_MONTH_D_YYYY_FMT = "%B %#d %Y" if os.name == "nt" else "%B %-d %Y"
+
+
 def fmt_month_eng_d_yyyy(value, fallback="미해당"):
     d = parse_bubble_date(value)
     if d is None:
@@ -137,7 +223,7 @@ def fmt_month_eng_d_yyyy(value, fallback="미해당"):
         d = d.astimezone(KST).date()
     if isinstance(d, date):
         # e.g., "March 2 2026"
-        return d.strftime("%B %-d %Y") if os.name != "nt" else d.strftime("%B %#d %Y")
+        return d.strftime(_MONTH_D_YYYY_FMT)
     return fallback
 
 
@@ -161,52 +247,41 @@ def normalize_standards(value):
     if value is None:
         return set()
     if isinstance(value, list):
-        items = [safe_str(x) for x in value]
+        items = (safe_str(x) for x in value)
     else:
-        s = safe_str(value)
-        if s == "":
-            return set()
         # split by comma
-        items = [x.strip() for x in s.split(",")]
-    # normalize
-    out = set()
-    for it in items:
-        if it:
-            out.add(it.upper())
-    return out
+        items = (x.strip() for x in safe_str(value).split(","))
+    # normalize + drop empties in the same pass
+    return {it.upper() for it in items if it}
+
+
+# (has 9001, has 14001, has 45001) -> combo label
+_ISO_COMBO_LABELS = {
+    (True, True, True): "QEO",
+    (True, True, False): "QE(9001+14001)",
+    (False, True, True): "EO(14001+45001)",
+    (True, False, True): "QO(9001+45001)",
+    (True, False, False): "Q(9001)",
+    (False, True, False): "E(14001)",
+    (False, False, True): "O(45001)",
+}
 
 
 def iso_combo_label(standards_set):
-    q = "ISO 9001" in standards_set
-    e = "ISO 14001" in standards_set
-    o = "ISO 45001" in standards_set
-
-    if q and e and o:
-        return "QEO"
-    if q and e and not o:
-        return "QE(9001+14001)"
-    if e and o and not q:
-        return "EO(14001+45001)"
-    if q and o and not e:
-        return "QO(9001+45001)"
-    if q and not e and not o:
-        return "Q(9001)"
-    if e and not q and not o:
-        return "E(14001)"
-    if o and not q and not e:
-        return "O(45001)"
-    return ""
+    key = ("ISO 9001" in standards_set, "ISO 14001" in standards_set, "ISO 45001" in standards_set)
+    return _ISO_COMBO_LABELS.get(key, "")
+
+
+_APPLICATION_TYPE3_ENG = {
+    "최초": "Initial",
+    "전환": "Transferred",
+    "특별": "Special",
+}
 
 
 def map_application_type3(value):
     v = safe_str(value, "")
-    if v == "최초":
-        return "Initial"
-    if v == "전환":
-        return "Transferred"
-    if v == "특별":
-        return "Special"
-    return v  # if already English or other
+    return _APPLICATION_TYPE3_ENG.get(v, v)  # if already English or other
 
 
 def first_nonempty(*vals, default="미해당"):
@@ -217,32 +292,60 @@ def first_nonempty(*vals, default="미해당"):
     return default
 
 
+# control characters openpyxl rejects in cell values (IllegalCharacterError)
+_ILLEGAL_CELL_CHARS = str.maketrans(dict.fromkeys([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20)]))
+
+
+def sanitize_cell_value(v):
+    # single C-level pass instead of per-char checks / chained replace
+    if isinstance(v, str):
+        return v.translate(_ILLEGAL_CELL_CHARS)
+    return v
+
+
 # =========================
 # BUBBLE DATA API HELPERS
 # =========================
 
-_related_cache = {}
+# One keep-alive connection pool shared by every Bubble call (including the
+# prefetch threads): lookups reuse TCP/TLS connections instead of
+# handshaking per request.
+bubble_http = requests.Session()
+bubble_http.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=BUBBLE_FETCH_WORKERS))
+bubble_http.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=BUBBLE_FETCH_WORKERS))
 
-def bubble_get_object(type_name, obj_id):
+# Process-wide fetch pool: concurrent exports share the same bound on
+# in-flight Bubble requests instead of each starting its own threads.
+bubble_fetch_pool = ThreadPoolExecutor(max_workers=BUBBLE_FETCH_WORKERS, thread_name_prefix="bubble-fetch")
+
+_MISSING = object()
+
+def bubble_get_object(type_name, obj_id, cache):
+    """
+    cache: per-export dict {(type_name, id): data|None}, created by the
+    caller so overlapping exports never share or clear each other's lookups.
+    """
     if not obj_id:
         return None
     key = (type_name, obj_id)
-    if key in _related_cache:
-        return _related_cache[key]
+    # one dict probe per lookup (None is a valid cached miss)
+    cached = cache.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached
 
     url = f"{BUBBLE_DATA_API_BASE}/{type_name}/{obj_id}"
-    res = requests.get(url, headers=bubble_headers(), timeout=60)
+    res = bubble_http.get(url, headers=bubble_headers(), timeout=60)
     if not ok_status(res.status_code):
         # cache as None to avoid hammering
-        _related_cache[key] = None
+        cache[key] = None
         return None
 
-    data = res.json().get("response", {})
-    _related_cache[key] = data
+    data = bubble_json(res).get("response", {})
+    cache[key] = data
     return data
 
 
-def resolve_related(app_data, field_key, type_name):
+def resolve_related(app_data, field_key, type_name, cache):
     """
     app_data[field_key] could be:
       - dict (already expanded)
@@ -252,17 +355,66 @@ def resolve_related(app_data, field_key, type_name):
     v = app_data.get(field_key)
     if isinstance(v, dict):
         return v
-    if isinstance(v, str) and v.strip():
-        return bubble_get_object(type_name, v.strip())
+    if isinstance(v, str):
+        v = v.strip()
+        if v:
+            return bubble_get_object(type_name, v, cache)
     return None
 
 
-def get_all_applications():
+def prefetch_related(applications, cache):
+    """
+    Warm the export's cache for every referenced thing id using a bounded pool.
+    Lookups are network-bound, so fetching them one by one per row is the
+    slowest part of an export.
+    """
+    keys = set()
+    for app_data in applications:
+        for field_key, type_name in RELATED_FIELDS:
+            v = app_data.get(field_key)
+            if isinstance(v, str):
+                v = v.strip()
+                if v and (type_name, v) not in cache:
+                    keys.add((type_name, v))
+    if len(keys) == 1:
+        # nothing to overlap: fetch inline, skip the pool handoff
+        bubble_get_object(*keys.pop(), cache)
+        return
+
+    if keys:
+        # consume results so a fetch error is raised here, as in the serial path
+        list(bubble_fetch_pool.map(lambda k: bubble_get_object(*k, cache), keys))
+
+
+# Bubble Data API returns at most 100 things per search call
+BUBBLE_PAGE_LIMIT = 100
+
+
+def iter_applications():
+    """
+    Yield applications page by page, following Bubble's cursor until
+    "remaining" is 0 (a single search call caps at BUBBLE_PAGE_LIMIT).
+    get_all_applications() collects the full list, so every page ends up
+    in memory for the export.
+    """
     url = f"{BUBBLE_DATA_API_BASE}/{BUBBLE_APP_TYPE}"
-    res = requests.get(url, headers=bubble_headers(), timeout=90)
-    if not ok_status(res.status_code):
-        raise Exception(f"Bubble fetch error ({res.status_code}): {res.text}")
-    return res.json().get("response", {}).get("results", [])
+    cursor = 0
+    while True:
+        params = {"cursor": cursor, "limit": BUBBLE_PAGE_LIMIT}
+        res = bubble_http.get(url, headers=bubble_headers(), params=params, timeout=90)
+        if not ok_status(res.status_code):
+            raise Exception(f"Bubble fetch error ({res.status_code}): {res.text}")
+        page = bubble_json(res).get("response", {})
+        results = page.get("results", [])
+        yield from results
+
+        cursor += len(results)
+        if not results or not page.get("remaining"):
+            return
+
+
+def get_all_applications():
+    return list(iter_applications())
 
 
 def create_daily_excel_record(file_bubble_url, file_url, label, status="ready", source_count=0, note=""):
@@ -275,10 +427,10 @@ def create_daily_excel_record(file_bubble_url, file_url, label, status="ready",
         "source_count": source_count,
         "note": note
     }
-    res = requests.post(url, headers=bubble_headers(), json=payload, timeout=60)
+    res = bubble_http.post(url, headers=bubble_headers(), json=payload, timeout=60)
     if not ok_status(res.status_code):
         raise Exception(f"Bubble create error ({res.status_code}): {res.text}")
-    return res.json() if res.text else {"status": "success"}
+    return bubble_json(res) if res.text else {"status": "success"}
 
 
 def upload_file_to_bubble_storage(local_path: str, upload_filename: str) -> str:
@@ -287,9 +439,9 @@ def upload_file_to_bubble_storage(local_path: str, upload_filename: str) -> str:
 
     with open(local_path, "rb") as f:
         files = {
-            "file": (upload_filename, f, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            "file": (upload_filename, f, XLSX_MIMETYPE)
         }
-        res = requests.post(BUBBLE_FILEUPLOAD_URL, files=files, timeout=180)
+        res = bubble_http.post(BUBBLE_FILEUPLOAD_URL, files=files, timeout=180)
 
     if not ok_status(res.status_code):
         raise Exception(f"Bubble fileupload error ({res.status_code}): {res.text}")
@@ -299,7 +451,7 @@ def upload_file_to_bubble_storage(local_path: str, upload_filename: str) -> str:
     # JSON case (rare)
     if text.startswith("{"):
         try:
-            j = res.json()
+            j = bubble_json(res)
             if "url" in j:
                 return j["url"]
         except Exception:
@@ -320,351 +472,434 @@ def upload_file_to_bubble_storage(local_path: str, upload_filename: str) -> str:
 # EXCEL GENERATION (Sheet 1 filled as requested)
 # =========================
 
-def fill_sheet_1(ws, applications):
+SHEET_1_START_ROW = 9
+SHEET_1_NUM_COLS = 78
+
+# coalesce zip writes into large physical writes on save
+SAVE_BUFFER_SIZE = 1 << 20
+
+
+def build_sheet_1_row(idx, app_data, cache):
     """
-    Sheet 1: "1. 인증신청서 관리"
-    start row: 9
-    Col mapping: 1..78
+    Map one application to the Sheet 1 columns.
+    Returns list of SHEET_1_NUM_COLS values (index 0 = column A).
     """
-    start_row = 9
-    row = start_row
+    # resolve referenced things (if Bubble returns ids)
+    app_form = resolve_related(app_data, "01. Application Form", TYPE_APP_FORM, cache) or {}
+    calcu_db = resolve_related(app_data, "03. Calcu_DB", TYPE_CALCU_DB, cache) or {}
+    audit_program = resolve_related(app_data, "06. Audit Program", TYPE_AUDIT_PROGRAM, cache) or {}
+    dr_stage1 = resolve_related(app_data, "08. Decision Report : Stage1", TYPE_DECISION_STAGE1, cache) or {}
+    dr_stage2 = resolve_related(app_data, "09. Decision Report : Stage2", TYPE_DECISION_STAGE2, cache) or {}
+    cert_issuance = resolve_related(app_data, "11. Certificate issuance", TYPE_CERT_ISSUANCE, cache) or {}
 
-    for idx, app_data in enumerate(applications, start=1):
+    # ✅ NEW: Chapter Viewer
+    chapter_viewer = resolve_related(app_data, "Chapter Viewer", TYPE_CHAPTER_VIEWER, cache) or {}
 
-        # resolve referenced things (if Bubble returns ids)
-        app_form = resolve_related(app_data, "01. Application Form", TYPE_APP_FORM) or {}
-        calcu_db = resolve_related(app_data, "03. Calcu_DB", TYPE_CALCU_DB) or {}
-        audit_program = resolve_related(app_data, "06. Audit Program", TYPE_AUDIT_PROGRAM) or {}
-        dr_stage1 = resolve_related(app_data, "08. Decision Report : Stage1", TYPE_DECISION_STAGE1) or {}
-        dr_stage2 = resolve_related(app_data, "09. Decision Report : Stage2", TYPE_DECISION_STAGE2) or {}
-        cert_issuance = resolve_related(app_data, "11. Certificate issuance", TYPE_CERT_ISSUANCE) or {}
+    # standards flags
+    standards_set = normalize_standards(app_data.get("cert_standards"))
+    has_9001 = "ISO 9001" in standards_set
+    has_14001 = "ISO 14001" in standards_set
+    has_45001 = "ISO 45001" in standards_set
 
-        # ✅ NEW: Chapter Viewer
-        chapter_viewer = resolve_related(app_data, "Chapter Viewer", TYPE_CHAPTER_VIEWER) or {}
+    # 1..78 columns (slot 0 unused so c[n] is column n)
+    c = [""] * (SHEET_1_NUM_COLS + 1)
 
-        # standards flags
-        standards_set = normalize_standards(app_data.get("cert_standards"))
-        has_9001 = "ISO 9001" in standards_set
-        has_14001 = "ISO 14001" in standards_set
-        has_45001 = "ISO 45001" in standards_set
+    # 1 index
+    c[1] = idx
 
-        # 1..78 columns
-        c = {}
+    # 2 in_charge_of
+    c[2] = safe_str(app_data.get("in_charge_of"), "")
 
-        # 1 index
-        c[1] = idx
+    # 3 recommend (default IBGC)
+    c[3] = safe_str(app_data.get("recommend"), "IBGC")
 
-        # 2 in_charge_of
-        c[2] = safe_str(app_data.get("in_charge_of"), "")
+    # 4 JOB_NO
+    c[4] = safe_str(app_data.get("JOB_NO"), "")
 
-        # 3 recommend (default IBGC)
-        c[3] = safe_str(app_data.get("recommend"), "IBGC")
+    # 5 "O"
+    c[5] = "O"
 
-        # 4 JOB_NO
-        c[4] = safe_str(app_data.get("JOB_NO"), "")
+    # 6 Org Name (kor)
+    c[6] = safe_str(app_form.get("Organization Name(kor)"), "")
 
-        # 5 "O"
-        c[5] = "O"
+    # 7 Org Name (eng)
+    c[7] = safe_str(app_form.get("Organization Name(eng)"), "")
 
-        # 6 Org Name (kor)
-        c[6] = safe_str(app_form.get("Organization Name(kor)"), "")
+    # 8 ISO 9001 => 1 else "-"
+    c[8] = "1" if has_9001 else "-"
 
-        # 7 Org Name (eng)
-        c[7] = safe_str(app_form.get("Organization Name(eng)"), "")
+    # 9 ISO 14001 => 1 else "-"
+    c[9] = "1" if has_14001 else "-"
 
-        # 8 ISO 9001 => 1 else "-"
-        c[8] = "1" if has_9001 else "-"
+    # 10 ISO 45001 => 1 else "-"
+    c[10] = "1" if has_45001 else "-"
 
-        # 9 ISO 14001 => 1 else "-"
-        c[9] = "1" if has_14001 else "-"
+    # 11 application_type(3) map
+    c[11] = map_application_type3(app_data.get("application_type(3)"))
 
-        # 10 ISO 45001 => 1 else "-"
-        c[10] = "1" if has_45001 else "-"
+    # 12 application_type(5)
+    c[12] = safe_str(app_data.get("application_type(5)"), "")
 
-        # 11 application_type(3) map
-        c[11] = map_application_type3(app_data.get("application_type(3)"))
+    # 13 combo label
+    c[13] = iso_combo_label(standards_set)
 
-        # 12 application_type(5)
-        c[12] = safe_str(app_data.get("application_type(5)"), "")
+    # 14 Certification Scope(eng)
+    c[14] = safe_str(app_form.get("Certification Scope(eng)"), "")
 
-        # 13 combo label
-        c[13] = iso_combo_label(standards_set)
+    # 15 Certification Scope(kor)
+    c[15] = safe_str(app_form.get("Certification Scope(kor)"), "")
 
-        # 14 Certification Scope(eng)
-        c[14] = safe_str(app_form.get("Certification Scope(eng)"), "")
+    # 16 IAF CODE
+    c[16] = safe_str(app_form.get("IAF CODE"), "")
 
-        # 15 Certification Scope(kor)
-        c[15] = safe_str(app_form.get("Certification Scope(kor)"), "")
+    # 17 blank
+    c[17] = ""
 
-        # 16 IAF CODE
-        c[16] = safe_str(app_form.get("IAF CODE"), "")
+    # 18 EMS RISK
+    c[18] = safe_str(app_form.get("EMS RISK"), "")
 
-        # 17 blank
-        c[17] = ""
+    # 19 OHS RISK
+    c[19] = safe_str(app_form.get("OHS RISK"), "")
 
-        # 18 EMS RISK
-        c[18] = safe_str(app_form.get("EMS RISK"), "")
+    # 20 Business Registration No.
+    c[20] = safe_str(app_form.get("Business Registration No."), "")
 
-        # 19 OHS RISK
-        c[19] = safe_str(app_form.get("OHS RISK"), "")
+    # 21 President(kor)
+    c[21] = safe_str(app_form.get("President(kor)"), "")
 
-        # 20 Business Registration No.
-        c[20] = safe_str(app_form.get("Business Registration No."), "")
+    # 22 Contact Person (on Application)
+    c[22] = safe_str(app_data.get("Contact Person"), "")
 
-        # 21 President(kor)
-        c[21] = safe_str(app_form.get("President(kor)"), "")
+    # 23 Contact person's Tel
+    c[23] = safe_str(app_form.get("Contact person's Tel"), "")
 
-        # 22 Contact Person (on Application)
-        c[22] = safe_str(app_data.get("Contact Person"), "")
+    # 24 Contact person's E-mail
+    c[24] = safe_str(app_form.get("Contact person's E-mail"), "")
 
-        # 23 Contact person's Tel
-        c[23] = safe_str(app_form.get("Contact person's Tel"), "")
+    # 25 Address kor full + ", " + detail(kor)
+    addr_full_kor = safe_str(app_form.get("Organization_adress_full(kor)"), "")
+    addr_detail_kor = safe_str(app_form.get("Organization_adress_detail(kor)"), "")
+    c[25] = (addr_full_kor + (", " if addr_full_kor and addr_detail_kor else "") + addr_detail_kor).strip()
 
-        # 24 Contact person's E-mail
-        c[24] = safe_str(app_form.get("Contact person's E-mail"), "")
+    # 26 blank
+    c[26] = ""
 
-        # 25 Address kor full + ", " + detail(kor)
-        addr_full_kor = safe_str(app_form.get("Organization_adress_full(kor)"), "")
-        addr_detail_kor = safe_str(app_form.get("Organization_adress_detail(kor)"), "")
-        c[25] = (addr_full_kor + (", " if addr_full_kor and addr_detail_kor else "") + addr_detail_kor).strip()
+    # 27 detail(eng) + ", " + full(eng)
+    addr_detail_eng = safe_str(app_form.get("Organization_adress_detail(eng)"), "")
+    addr_full_eng = safe_str(app_form.get("Organization_adress_full(eng)"), "")
+    c[27] = (addr_detail_eng + (", " if addr_detail_eng and addr_full_eng else "") + addr_full_eng).strip()
 
-        # 26 blank
-        c[26] = ""
+    # 28 "(" + postcode + ")" + full(eng) + ", " + detail(eng)
+    postcode = safe_str(app_form.get("Organization_postcode"), "")
+    core = addr_full_eng + (", " if addr_full_eng and addr_detail_eng else "") + addr_detail_eng
+    if postcode and core:
+        c[28] = f"({postcode}){core}"
+    elif postcode and not core:
+        c[28] = f"({postcode})"
+    else:
+        c[28] = core.strip()
 
-        # 27 detail(eng) + ", " + full(eng)
-        addr_detail_eng = safe_str(app_form.get("Organization_adress_detail(eng)"), "")
-        addr_full_eng = safe_str(app_form.get("Organization_adress_full(eng)"), "")
-        c[27] = (addr_detail_eng + (", " if addr_detail_eng and addr_full_eng else "") + addr_full_eng).strip()
+    # 29 postcode
+    c[29] = postcode
 
-        # 28 "(" + postcode + ")" + full(eng) + ", " + detail(eng)
-        postcode = safe_str(app_form.get("Organization_postcode"), "")
-        core = addr_full_eng + (", " if addr_full_eng and addr_detail_eng else "") + addr_detail_eng
-        if postcode and core:
-            c[28] = f"({postcode}){core}"
-        elif postcode and not core:
-            c[28] = f"({postcode})"
-        else:
-            c[28] = core.strip()
+    # 30 Outsourcing process default none
+    c[30] = safe_str(app_form.get("Outsourcing process"), "none")
 
-        # 29 postcode
-        c[29] = postcode
+    # 31 Number of Employees(certi)
+    c[31] = safe_str(app_form.get("Number of Employees(certi)"), "")
 
-        # 30 Outsourcing process default none
-        c[30] = safe_str(app_form.get("Outsourcing process"), "none")
+    # 32 Name of Product/Service1
+    c[32] = safe_str(app_form.get("Name of Product/Service1"), "")
 
-        # 31 Number of Employees(certi)
-        c[31] = safe_str(app_form.get("Number of Employees(certi)"), "")
+    # 33 Recently Date of audit (MonthEng day year) else 미해당
+    c[33] = fmt_month_eng_d_yyyy(app_form.get("Recently Date of audit"), fallback="미해당")
 
-        # 32 Name of Product/Service1
-        c[32] = safe_str(app_form.get("Name of Product/Service1"), "")
+    # 34 Recently audit type(5) fallback chain else 미해당
+    c[34] = first_nonempty(
+        app_form.get("Recently_9001_Audit Type(5)"),
+        app_form.get("Recently_14001_Audit Type(5)"),
+        app_form.get("Recently_45001_Audit Type(5)"),
+        default="미해당"
+    )
 
-        # 33 Recently Date of audit (MonthEng day year) else 미해당
-        c[33] = fmt_month_eng_d_yyyy(app_form.get("Recently Date of audit"), fallback="미해당")
+    # 35 Next Date of audit
+    c[35] = fmt_month_eng_d_yyyy(app_form.get("Next Date of audit"), fallback="미해당")
 
-        # 34 Recently audit type(5) fallback chain else 미해당
-        c[34] = first_nonempty(
-            app_form.get("Recently_9001_Audit Type(5)"),
-            app_form.get("Recently_14001_Audit Type(5)"),
-            app_form.get("Recently_45001_Audit Type(5)"),
-            default="미해당"
-        )
+    # 36 Next audit type(5) fallback chain
+    c[36] = first_nonempty(
+        app_form.get("Next_9001_Audit Type(5)"),
+        app_form.get("Next_14001_Audit Type(5)"),
+        app_form.get("Next_45001_Audit Type(5)"),
+        default="미해당"
+    )
 
-        # 35 Next Date of audit
-        c[35] = fmt_month_eng_d_yyyy(app_form.get("Next Date of audit"), fallback="미해당")
+    # 37 _인증전환신청_인증서유효기간 yyyy-mm-dd else 미해당
+    c[37] = fmt_yyyy_mm_dd(app_data.get("_인증전환신청_인증서유효기간"), fallback="미해당")
 
-        # 36 Next audit type(5) fallback chain
-        c[36] = first_nonempty(
-            app_form.get("Next_9001_Audit Type(5)"),
-            app_form.get("Next_14001_Audit Type(5)"),
-            app_form.get("Next_45001_Audit Type(5)"),
-            default="미해당"
-        )
+    # 38 _인증전환신청_타인증기관명 else 미해당
+    c[38] = safe_str(app_data.get("_인증전환신청_타인증기관명"), "미해당")
 
-        # 37 _인증전환신청_인증서유효기간 yyyy-mm-dd else 미해당
-        c[37] = fmt_yyyy_mm_dd(app_data.get("_인증전환신청_인증서유효기간"), fallback="미해당")
+    # 39 _법적의무사항_관련법
+    c[39] = safe_str(app_data.get("_법적의무사항_관련법"), "")
 
-        # 38 _인증전환신청_타인증기관명 else 미해당
-        c[38] = safe_str(app_data.get("_인증전환신청_타인증기관명"), "미해당")
+    # 40 Declaration of date yyyy-mm-dd
+    c[40] = fmt_yyyy_mm_dd(app_form.get("Declaration of date"), fallback="")
 
-        # 39 _법적의무사항_관련법
-        c[39] = safe_str(app_data.get("_법적의무사항_관련법"), "")
+    # 41 stage1 audit date yyyy-mm-dd
+    c[41] = fmt_yyyy_mm_dd(app_form.get("stage1 audit date"), fallback="")
 
-        # 40 Declaration of date yyyy-mm-dd
-        c[40] = fmt_yyyy_mm_dd(app_form.get("Declaration of date"), fallback="")
+    # 42 stage2 audit date yyyy-mm-dd
+    c[42] = fmt_yyyy_mm_dd(app_form.get("stage2 audit date"), fallback="")
 
-        # 41 stage1 audit date yyyy-mm-dd
-        c[41] = fmt_yyyy_mm_dd(app_form.get("stage1 audit date"), fallback="")
+    # stage1/stage2 M/D are used by 43, 44 and 47 -> read once
+    md_stage1 = calcu_db.get("17. Final M/D-stage1")
+    md_stage2 = calcu_db.get("17. Final M/D-stage2")
 
-        # 42 stage2 audit date yyyy-mm-dd
-        c[42] = fmt_yyyy_mm_dd(app_form.get("stage2 audit date"), fallback="")
+    # 43 Final M/D-stage1 (1 decimal)
+    c[43] = fmt_1_decimal(md_stage1, fallback="")
 
-        # 43 Final M/D-stage1 (1 decimal)
-        c[43] = fmt_1_decimal(calcu_db.get("17. Final M/D-stage1"), fallback="")
+    # 44 Final M/D-stage2 (1 decimal)
+    c[44] = fmt_1_decimal(md_stage2, fallback="")
 
-        # 44 Final M/D-stage2 (1 decimal)
-        c[44] = fmt_1_decimal(calcu_db.get("17. Final M/D-stage2"), fallback="")
+    # 45 Final M/D-eachsurv (1 decimal)
+    c[45] = fmt_1_decimal(calcu_db.get("17. Final M/D-eachsurv"), fallback="")
 
-        # 45 Final M/D-eachsurv (1 decimal)
-        c[45] = fmt_1_decimal(calcu_db.get("17. Final M/D-eachsurv"), fallback="")
+    # 46 Final M/D-recert (1 decimal)
+    c[46] = fmt_1_decimal(calcu_db.get("17. Final M/D-recert"), fallback="")
 
-        # 46 Final M/D-recert (1 decimal)
-        c[46] = fmt_1_decimal(calcu_db.get("17. Final M/D-recert"), fallback="")
+    # 47 stage1 + stage2 (1 decimal)
+    try:
+        v1 = float(md_stage1 or 0)
+        v2 = float(md_stage2 or 0)
+        c[47] = f"{(v1 + v2):.1f}"
+    except Exception:
+        c[47] = ""
 
-        # 47 stage1 + stage2 (1 decimal)
-        try:
-            v1 = float(calcu_db.get("17. Final M/D-stage1") or 0)
-            v2 = float(calcu_db.get("17. Final M/D-stage2") or 0)
-            c[47] = f"{(v1 + v2):.1f}"
-        except Exception:
-            c[47] = ""
+    # ✅ 48: '김정석' (고정)
+    c[48] = "김정석"
 
-        # ✅ 48: '김정석' (고정)
-        c[48] = "김정석"
+    # ✅ 49: Chapter Viewer - Technical reviewer
+    c[49] = safe_str(chapter_viewer.get("Technical reviewer"), "")
 
-        # ✅ 49: Chapter Viewer - Technical reviewer
-        c[49] = safe_str(chapter_viewer.get("Technical reviewer"), "")
+    # ✅ 50: Chapter Viewer - Date of Receipt (yyyy-mm-dd)
+    c[50] = fmt_yyyy_mm_dd(chapter_viewer.get("Date of Receipt"), fallback="")
 
-        # ✅ 50: Chapter Viewer - Date of Receipt (yyyy-mm-dd)
-        c[50] = fmt_yyyy_mm_dd(chapter_viewer.get("Date of Receipt"), fallback="")
+    # 51 Lead auditor
+    c[51] = safe_str(app_form.get("Lead auditor"), "")
 
-        # 51 Lead auditor
-        c[51] = safe_str(app_form.get("Lead auditor"), "")
+    # 52 auditor
+    c[52] = safe_str(app_form.get("auditor"), "")
 
-        # 52 auditor
-        c[52] = safe_str(app_form.get("auditor"), "")
+    # 53 provisional auditor
+    c[53] = safe_str(app_form.get("provisional auditor"), "")
 
-        # 53 provisional auditor
-        c[53] = safe_str(app_form.get("provisional auditor"), "")
+    # 54 technical expert
+    c[54] = safe_str(app_form.get("technical expert"), "")
 
-        # 54 technical expert
-        c[54] = safe_str(app_form.get("technical expert"), "")
+    # 55 observer
+    c[55] = safe_str(app_form.get("observer"), "")
 
-        # 55 observer
-        c[55] = safe_str(app_form.get("observer"), "")
+    # ✅ 56: '김정석' (고정)
+    c[56] = "김정석"
 
-        # ✅ 56: '김정석' (고정)
-        c[56] = "김정석"
+    # 57 Date of Audit_transfer yyyy-mm-dd
+    c[57] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_transfer"), fallback="")
 
-        # 57 Date of Audit_transfer yyyy-mm-dd
-        c[57] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_transfer"), fallback="")
+    # 58 Date of Audit_Re_certi yyyy-mm-dd
+    c[58] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_Re_certi"), fallback="")
 
-        # 58 Date of Audit_Re_certi yyyy-mm-dd
-        c[58] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_Re_certi"), fallback="")
+    # 59 Date of Audit_select1 yyyy-mm-dd
+    c[59] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_select1"), fallback="")
 
-        # 59 Date of Audit_select1 yyyy-mm-dd
-        c[59] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_select1"), fallback="")
+    # 60 Date of Audit_select2 yyyy-mm-dd
+    c[60] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_select2"), fallback="")
 
-        # 60 Date of Audit_select2 yyyy-mm-dd
-        c[60] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_select2"), fallback="")
+    # 61 Date of Audit_select3 yyyy-mm-dd
+    c[61] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_select3"), fallback="")
 
-        # 61 Date of Audit_select3 yyyy-mm-dd
-        c[61] = fmt_yyyy_mm_dd(audit_program.get("Date of Audit_select3"), fallback="")
+    # 62 Audit_md_01
+    c[62] = safe_str(audit_program.get("Audit_md_01"), "")
 
-        # 62 Audit_md_01
-        c[62] = safe_str(audit_program.get("Audit_md_01"), "")
+    # 63 Audit_md_02
+    c[63] = safe_str(audit_program.get("Audit_md_02"), "")
 
-        # 63 Audit_md_02
-        c[63] = safe_str(audit_program.get("Audit_md_02"), "")
+    # 64 Audit_md_03
+    c[64] = safe_str(audit_program.get("Audit_md_03"), "")
 
-        # 64 Audit_md_03
-        c[64] = safe_str(audit_program.get("Audit_md_03"), "")
+    # 65 Audit_md_04
+    c[65] = safe_str(audit_program.get("Audit_md_04"), "")
 
-        # 65 Audit_md_04
-        c[65] = safe_str(audit_program.get("Audit_md_04"), "")
+    # 66 Audit_md_05
+    c[66] = safe_str(audit_program.get("Audit_md_05"), "")
 
-        # 66 Audit_md_05
-        c[66] = safe_str(audit_program.get("Audit_md_05"), "")
+    # ✅ 67: Stage1 audit type(5) "있으면" Stage 1 Certification audit, 없으면 '-'
+    c[67] = "Stage 1 Certification audit" if safe_str(dr_stage1.get("audit type(5)"), "") != "" else "-"
 
-        # ✅ 67: Stage1 audit type(5) "있으면" Stage 1 Certification audit, 없으면 '-'
-        c[67] = "Stage 1 Certification audit" if safe_str(dr_stage1.get("audit type(5)"), "") != "" else "-"
+    # ✅ 68: Stage1 Approval of Evaluation_Date yyyy-mm-dd else '-'
+    c[68] = fmt_yyyy_mm_dd(dr_stage1.get("Approval of Evaluation_Date"), fallback="-")
 
-        # ✅ 68: Stage1 Approval of Evaluation_Date yyyy-mm-dd else '-'
-        c[68] = fmt_yyyy_mm_dd(dr_stage1.get("Approval of Evaluation_Date"), fallback="-")
+    # ✅ 69: Stage2 audit type(5) "있으면" Stage 2 Certification audit, 없으면 '-'
+    c[69] = "Stage 2 Certification audit" if safe_str(dr_stage2.get("audit type(5)"), "") != "" else "-"
 
-        # ✅ 69: Stage2 audit type(5) "있으면" Stage 2 Certification audit, 없으면 '-'
-        c[69] = "Stage 2 Certification audit" if safe_str(dr_stage2.get("audit type(5)"), "") != "" else "-"
+    # ✅ 70: Stage2 Verification Date yyyy-mm-dd else '-'
+    c[70] = fmt_yyyy_mm_dd(dr_stage2.get("Verification Date"), fallback="-")
 
-        # ✅ 70: Stage2 Verification Date yyyy-mm-dd else '-'
-        c[70] = fmt_yyyy_mm_dd(dr_stage2.get("Verification Date"), fallback="-")
+    # 71 Reviewer of Certification Records else '-'
+    c[71] = safe_str(dr_stage2.get("Reviewer of Certification Records"), "-")
 
-        # 71 Reviewer of Certification Records else '-'
-        c[71] = safe_str(dr_stage2.get("Reviewer of Certification Records"), "-")
+    # 72 constant
+    c[72] = "GM 이원호"
 
-        # 72 constant
-        c[72] = "GM 이원호"
+    # 73 Initial Date_* yyyy-mm-dd (first among 9001/14001/45001)
+    c[73] = fmt_yyyy_mm_dd(
+        first_nonempty(
+            cert_issuance.get("Initial Date_9001"),
+            cert_issuance.get("Initial Date_14001"),
+            cert_issuance.get("Initial Date_45001"),
+            default=""
+        ),
+        fallback=""
+    )
 
-        # 73 Initial Date_* yyyy-mm-dd (first among 9001/14001/45001)
-        c[73] = fmt_yyyy_mm_dd(
-            first_nonempty(
-                cert_issuance.get("Initial Date_9001"),
-                cert_issuance.get("Initial Date_14001"),
-                cert_issuance.get("Initial Date_45001"),
-                default=""
-            ),
-            fallback=""
-        )
+    # 74 Issue Date_* yyyy-mm-dd
+    c[74] = fmt_yyyy_mm_dd(
+        first_nonempty(
+            cert_issuance.get("Issue Date_9001"),
+            cert_issuance.get("Issue Date_14001"),
+            cert_issuance.get("Issue Date_45001"),
+            default=""
+        ),
+        fallback=""
+    )
 
-        # 74 Issue Date_* yyyy-mm-dd
-        c[74] = fmt_yyyy_mm_dd(
-            first_nonempty(
-                cert_issuance.get("Issue Date_9001"),
-                cert_issuance.get("Issue Date_14001"),
-                cert_issuance.get("Issue Date_45001"),
-                default=""
-            ),
-            fallback=""
-        )
+    # 75 Expire Date_* yyyy-mm-dd
+    c[75] = fmt_yyyy_mm_dd(
+        first_nonempty(
+            cert_issuance.get("Expire Date_9001"),
+            cert_issuance.get("Expire Date_14001"),
+            cert_issuance.get("Expire Date_45001"),
+            default=""
+        ),
+        fallback=""
+    )
 
-        # 75 Expire Date_* yyyy-mm-dd
-        c[75] = fmt_yyyy_mm_dd(
-            first_nonempty(
-                cert_issuance.get("Expire Date_9001"),
-                cert_issuance.get("Expire Date_14001"),
-                cert_issuance.get("Expire Date_45001"),
-                default=""
-            ),
-            fallback=""
-        )
+    # 76 Certificate No._9001
+    c[76] = safe_str(cert_issuance.get("Certificate No._9001"), "")
 
-        # 76 Certificate No._9001
-        c[76] = safe_str(cert_issuance.get("Certificate No._9001"), "")
+    # 77 Certificate No._14001
+    c[77] = safe_str(cert_issuance.get("Certificate No._14001"), "")
 
-        # 77 Certificate No._14001
-        c[77] = safe_str(cert_issuance.get("Certificate No._14001"), "")
+    # 78 Certificate No._45001
+    c[78] = safe_str(cert_issuance.get("Certificate No._45001"), "")
 
-        # 78 Certificate No._45001
-        c[78] = safe_str(cert_issuance.get("Certificate No._45001"), "")
+    return c[1:]
 
-        # write to worksheet (A=1 ..)
-        for col_idx in range(1, 79):
-            ws.cell(row=row, column=col_idx, value=c.get(col_idx, ""))
 
-        row += 1
+def write_row(ws, row, values):
+    """
+    Write one row of values starting at column A.
+    Template data rows are blank (style only), so empty values are skipped.
+    """
+    cell = ws.cell
+    for col_idx, value in enumerate(values, start=1):
+        if value is None or value == "":
+            continue
+        cell(row, col_idx, sanitize_cell_value(value))
 
 
-def generate_excel_file():
-    applications = get_all_applications()
+def write_rows(ws, start_row, rows):
+    """
+    Write rows top to bottom in one contiguous pass.
+    """
+    for row, values in enumerate(rows, start=start_row):
+        write_row(ws, row, values)
+
+
+def build_sheet_1_rows(applications, cache):
+    """
+    Sheet 1: "1. 인증신청서 관리"
+    start row: 9
+    Col mapping: 1..78
+    """
+    return [build_sheet_1_row(idx, app_data, cache) for idx, app_data in enumerate(applications, start=1)]
+
+
+_template_bytes = None
+
+def load_template():
+    """
+    Template is static: read and validate it once per process and parse each
+    export from the in-memory copy.
+    """
+    global _template_bytes
+    # openpyxl is the heaviest import here; keep it off the cold-start path
+    from openpyxl import load_workbook
+
+    if _template_bytes is not None:
+        return load_workbook(BytesIO(_template_bytes))
 
     if not os.path.exists(TEMPLATE_PATH):
         raise Exception(f"Template file not found: {TEMPLATE_PATH}")
-
-    wb = load_workbook(TEMPLATE_PATH)
+    with open(TEMPLATE_PATH, "rb") as f:
+        data = f.read()
+    wb = load_workbook(BytesIO(data))
 
     # Ensure 4 sheets exist by name
     for name in (SHEET_1, SHEET_2, SHEET_3, SHEET_4):
         if name not in wb.sheetnames:
             raise Exception(f"Template missing sheet: '{name}'")
 
+    _template_bytes = data
+    return wb
+
+
+def save_workbook_file(wb, file_path):
+    """
+    Same as wb.save(), but through a buffered file and with a configurable
+    deflate level (openpyxl's save hardcodes the zlib default).
+    Written to a temp file and renamed into place, so /download never
+    serves a half-written zip.
+    """
+    from openpyxl.writer.excel import ExcelWriter
+
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, "wb", buffering=SAVE_BUFFER_SIZE) as f:
+            with ZipFile(f, "w", ZIP_DEFLATED, allowZip64=True, compresslevel=XLSX_COMPRESSLEVEL) as archive:
+                wb.properties.modified = datetime.now(timezone.utc).replace(tzinfo=None)
+                ExcelWriter(wb, archive).save()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        # don't leave a partial .tmp behind in generated/
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def generate_excel_file():
+    applications = get_all_applications()
+
+    # related things are cached per export only: a process-lifetime cache
+    # grows without bound and would keep serving edits made in Bubble stale
+    related_cache = {}
+
     # ✅ Fill ONLY sheet 1 for now (as requested)
-    ws1 = wb[SHEET_1]
-    fill_sheet_1(ws1, applications)
+    # all Bubble lookups/mapping happen before the workbook is touched
+    prefetch_related(applications, related_cache)
+    rows_1 = build_sheet_1_rows(applications, related_cache)
+
+    wb = load_template()
+    write_rows(wb[SHEET_1], SHEET_1_START_ROW, rows_1)
 
     filename = today_label()
-    generated_dir = "generated"
-    os.makedirs(generated_dir, exist_ok=True)
+    os.makedirs(GENERATED_DIR, exist_ok=True)
 
-    file_path = os.path.join(generated_dir, filename)
-    wb.save(file_path)
+    file_path = os.path.join(GENERATED_DIR, filename)
+    save_workbook_file(wb, file_path)
 
     # ✅ Upload to Bubble storage
     bubble_file_url = upload_file_to_bubble_storage(file_path, filename)
@@ -687,15 +922,30 @@ def generate_excel_file():
 # ROUTES
 # =========================
 
+# constant bodies, serialized once
+_BODY_HEALTH_OK = orjson.dumps({"ok": True})
+_BODY_UNAUTHORIZED = orjson.dumps({"ok": False, "error": "Unauthorized"})
+_BODY_NOT_FOUND = orjson.dumps({"ok": False, "error": "Not found"})
+_BODY_TOO_LARGE = orjson.dumps({"ok": False, "error": "Payload too large"})
+
+
+@app.before_request
+def reject_oversized_body():
+    # routes never read the body, so Flask's own limit would not trigger;
+    # check the declared length up front instead
+    if request.content_length is not None and request.content_length > MAX_CONTENT_LENGTH:
+        return json_response(_BODY_TOO_LARGE), 413
+
+
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"ok": True})
+    return json_response(_BODY_HEALTH_OK)
 
 
 @app.route("/excel/generate_daily", methods=["POST"])
 def excel_generate_daily():
     if not require_api_key(request):
-        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+        return json_response(_BODY_UNAUTHORIZED), 401
 
     try:
         result = generate_excel_file()
@@ -709,7 +959,7 @@ def excel_generate_daily():
             note=""
         )
 
-        return jsonify({
+        return json_response({
             "ok": True,
             "file": result["bubble_file_url"],
             "file_url": result["download_url"],
@@ -720,7 +970,7 @@ def excel_generate_daily():
         })
 
     except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+        return json_response({"ok": False, "error": str(e)}), 500
 
 
 @app.route("/excel/refresh_now", methods=["POST"])
@@ -730,8 +980,20 @@ def excel_refresh_now():
 
 @app.route("/download/<filename>", methods=["GET"])
 def download_local_file(filename):
-    generated_dir = "generated"
-    return send_from_directory(generated_dir, filename, as_attachment=True)
+    # reject anything that isn't one of our exports before touching the disk
+    if not is_generated_filename(filename):
+        return json_response(_BODY_NOT_FOUND), 404
+
+    if X_ACCEL_REDIRECT_PREFIX:
+        # nginx serves the bytes; the worker only returns headers
+        res = app.response_class(mimetype=XLSX_MIMETYPE)
+        res.headers["X-Accel-Redirect"] = X_ACCEL_REDIRECT_PREFIX + filename
+        res.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return res
+
+    # ETag/Range (304/206) are send_from_directory's defaults; max_age=0 adds
+    # an explicit "max-age=0" + Expires so caches always revalidate
+    return send_from_directory(GENERATED_DIR, filename, as_attachment=True, max_age=0)
 
 
 # =========================
@@ -0,0 +1,54 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import orjson
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.status_code = 200
+        self.content = orjson.dumps(body)
+        self.text = self.content.decode()
+
+
+def fake_bubble_search(total):
+    """Serve `total` applications the way Bubble's search endpoint pages them."""
+    requested = []
+
+    def get(url, headers=None, params=None, timeout=None):
+        cursor, limit = params["cursor"], params["limit"]
+        requested.append(cursor)
+        results = [{"_id": str(i)} for i in range(cursor, min(cursor + limit, total))]
+        remaining = max(total - cursor - len(results), 0)
+        return FakeResponse({"response": {"cursor": cursor, "results": results, "count": len(results), "remaining": remaining}})
+
+    return get, requested
+
+
+class GetAllApplicationsTest(unittest.TestCase):
+    def test_follows_cursor_past_first_page(self):
+        get, requested = fake_bubble_search(250)
+        with mock.patch.object(app.bubble_http, "get", side_effect=get):
+            applications = app.get_all_applications()
+
+        self.assertEqual(len(applications), 250)
+        self.assertEqual([a["_id"] for a in applications], [str(i) for i in range(250)])
+        self.assertEqual(requested, [0, 100, 200])
+
+    def test_single_page(self):
+        get, requested = fake_bubble_search(30)
+        with mock.patch.object(app.bubble_http, "get", side_effect=get):
+            applications = app.get_all_applications()
+
+        self.assertEqual(len(applications), 30)
+        self.assertEqual(requested, [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app  # noqa: E402
+
+EXPORT_NAME = "IBGC_Application_20240301_090000.xlsx"
+
+
+class DownloadRouteTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(app, "GENERATED_DIR", self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_serves_an_export(self):
+        with open(os.path.join(self.tmp.name, EXPORT_NAME), "wb") as f:
+            f.write(b"xlsx bytes")
+
+        res = self.client.get(f"/download/{EXPORT_NAME}")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data, b"xlsx bytes")
+        res.close()
+
+    def test_rejects_names_that_are_not_exports(self):
+        # present on disk, but not a today_label() name
+        for name in ("notes.txt", "IBGC_Application_2024.xlsx", EXPORT_NAME + ".tmp", "app.py"):
+            with open(os.path.join(self.tmp.name, name), "wb") as f:
+                f.write(b"x")
+
+            res = self.client.get(f"/download/{name}")
+
+            self.assertEqual(res.status_code, 404, name)
+            self.assertEqual(res.get_json(), {"ok": False, "error": "Not found"})
+
+    def test_missing_export_is_404(self):
+        res = self.client.get(f"/download/{EXPORT_NAME}")
+
+        self.assertEqual(res.status_code, 404)
+
+
+class OversizedBodyTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        for name, value in (("MAX_CONTENT_LENGTH", 16), ("EXCEL_API_KEY", "")):
+            patcher = mock.patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(app, "generate_excel_file", side_effect=RuntimeError("export ran"))
+        self.generate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rejects_body_over_limit_before_export(self):
+        res = self.client.post("/excel/generate_daily", data=b"x" * 17)
+
+        self.assertEqual(res.status_code, 413)
+        self.assertEqual(res.get_json(), {"ok": False, "error": "Payload too large"})
+        self.generate.assert_not_called()
+
+    def test_body_at_limit_reaches_route(self):
+        res = self.client.post("/excel/generate_daily", data=b"{}".ljust(16))
+
+        self.assertEqual(res.status_code, 500)
+        self.assertEqual(res.get_json(), {"ok": False, "error": "export ran"})
+        self.generate.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+from datetime import date
+
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app  # noqa: E402
+
+
+class WriteRowTest(unittest.TestCase):
+    def setUp(self):
+        self.ws = Workbook().active
+
+    def test_strips_illegal_control_characters(self):
+        app.write_row(self.ws, 1, ["a\x07b\x00c\x1fd", "line1\nline2\tcol\r"])
+
+        self.assertEqual(self.ws.cell(1, 1).value, "abcd")
+        # tab, newline and carriage return are legal in cells and kept
+        self.assertEqual(self.ws.cell(1, 2).value, "line1\nline2\tcol\r")
+
+    def test_non_strings_pass_through(self):
+        d = date(2024, 3, 1)
+        app.write_row(self.ws, 1, [7, 1.5, d, True])
+
+        self.assertEqual([self.ws.cell(1, c).value for c in range(1, 5)], [7, 1.5, d, True])
+
+    def test_empty_values_are_skipped(self):
+        app.write_row(self.ws, 1, ["", None, "x"])
+
+        self.assertIsNone(self.ws.cell(1, 1).value)
+        self.assertIsNone(self.ws.cell(1, 2).value)
+        self.assertEqual(self.ws.cell(1, 3).value, "x")
+
+
+if __name__ == "__main__":
+    unittest.main()